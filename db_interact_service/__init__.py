@@ -1,41 +1,83 @@
 # --- db_interact_service/__init__.py ---
 import logging
+import logging.config
+import click
 from flask import Flask
 # Use relative imports within the package
 from .config import Config
-from .models import close_db
-from .routes import data_bp, internal_bp
+from .models import init_db, get_db, ensure_indexes
+from .routes import data_bp, internal_bp, testing_bp
+from .utils import OrjsonProvider
+
+_logging_configured = False
+
+def configure_logging(level="INFO"):
+    """
+    Configures process-wide logging once (format compiled once, level from config).
+    Safe to call repeatedly, e.g. when create_app() is called more than once.
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    logging.config.dictConfig({
+        "version": 1,
+        "disable_existing_loggers": False,
+        "formatters": {
+            "default": {"format": "%(asctime)s %(levelname)s [%(name)s] %(message)s"},
+        },
+        "handlers": {
+            "console": {"class": "logging.StreamHandler", "formatter": "default"},
+        },
+        "root": {"level": level, "handlers": ["console"]},
+    })
+    _logging_configured = True
 
 def create_app():
     """Factory function to create the DB Interact Flask application."""
     app = Flask(__name__)
+    # Encode/decode all JSON (jsonify, request.get_json) with orjson
+    app.json = OrjsonProvider(app)
     # Load configuration from the Config object
     app.config.from_object(Config)
 
-    # Configure logging
-    logging.basicConfig(level=logging.INFO)
+    # Configure logging (once per process; level from LOG_LEVEL)
+    configure_logging(app.config.get('LOG_LEVEL', 'INFO'))
     app.logger.info("DB Interact Service starting up...")
-    app.logger.info(f"Attempting to connect to OPERATIONAL_MONGO_URI: {app.config.get('MONGO_URI')[:15]}...")
+    app.logger.info("Attempting to connect to OPERATIONAL_MONGO_URI: %s...", app.config.get('MONGO_URI')[:15])
+
+    # Create the shared MongoClient once for the whole application (see models.py)
+    init_db(app)
 
-    # Register database teardown function from models.py
-    app.teardown_appcontext(close_db)
+    # Index creation is an explicit step ('flask ensure-indexes', run once per deploy),
+    # so building the app never touches the database
+    @app.cli.command("ensure-indexes")
+    def ensure_indexes_command():
+        """Creates the indexes backing the hot query paths (idempotent)."""
+        try:
+            ensure_indexes(get_db())
+        except Exception as e:
+            raise click.ClickException(f"Failed to ensure operational DB indexes: {e}")
+        click.echo("Operational DB indexes ensured.")
 
     # Register the blueprints for the application
     app.register_blueprint(data_bp)
     app.register_blueprint(internal_bp)
+    if app.config.get('ENABLE_TEST_SETUP_ENDPOINT'):
+        # Dev/test-only helper routes; never enable in production
+        app.register_blueprint(testing_bp)
+        app.logger.warning("Test setup endpoint enabled (ENABLE_TEST_SETUP_ENDPOINT).")
     app.logger.info("Blueprints registered.")
 
     # Basic root route for health check
     @app.route('/')
     def index():
         try:
-            from .models import get_db
-            get_db() # Attempt connection
+            get_db().command('ping') # Attempt connection (pooled client is lazy)
             return "DB Interact Service Running - DB Connection OK"
         except Exception as e:
-            app.logger.error(f"Health check DB connection failed: {e}")
+            app.logger.error("Health check DB connection failed: %s", e)
             # Return detailed error only if needed for debugging, might expose too much
-            return f"DB Interact Service Running - DB Connection FAILED", 500
+            return "DB Interact Service Running - DB Connection FAILED", 500
 
     app.logger.info("DB Interact Service application created.")
     return app
@@ -13,10 +13,46 @@ class Config:
     # It will be provided by docker-compose.
     # Use a distinct name like 'littlesteps_db' or 'operational_db'.
     MONGO_URI = os.environ.get('OPERATIONAL_MONGO_URI', 'mongodb://localhost:27017/littlesteps_db')
+    # Optional override; when unset the database name is parsed from MONGO_URI once at startup.
+    MONGO_DB_NAME = os.environ.get('OPERATIONAL_MONGO_DB_NAME')
+    # Connection pool sizing for the shared MongoClient. Each worker thread holds at most
+    # one connection at a time, so the pool should be >= the number of worker threads.
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('OPERATIONAL_MONGO_MAX_POOL_SIZE', 100))
+    # Connections kept open even when idle, so a burst after a quiet period skips the handshake
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('OPERATIONAL_MONGO_MIN_POOL_SIZE', 0))
+    # Upper bound for a single socket read/write so a stuck query can't pin a worker thread (ms)
+    MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('OPERATIONAL_MONGO_SOCKET_TIMEOUT_MS', 30000))
+    # How long a request thread may wait for a free pooled connection before failing (ms)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('OPERATIONAL_MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000))
+    # Wire compression, in order of preference (the server picks the first one it supports).
+    # zstd needs MongoDB >= 4.2 and the 'zstandard' package; zlib is always available.
+    MONGO_COMPRESSORS = os.environ.get('OPERATIONAL_MONGO_COMPRESSORS', 'zstd,zlib')
+    MONGO_ZLIB_COMPRESSION_LEVEL = int(os.environ.get('OPERATIONAL_MONGO_ZLIB_COMPRESSION_LEVEL', 6))
+    # Read preference for read-only list/detail queries (authorization checks always read the primary).
+    # One of: primary, primaryPreferred, secondary, secondaryPreferred, nearest.
+    MONGO_READONLY_READ_PREFERENCE = os.environ.get('OPERATIONAL_MONGO_READONLY_READ_PREFERENCE', 'secondaryPreferred')
+    # Read concern for the same read-only queries ('local' avoids waiting for majority commit).
+    MONGO_READONLY_READ_CONCERN = os.environ.get('OPERATIONAL_MONGO_READONLY_READ_CONCERN', 'local')
 
     # --- IMPORTANT ---
     # This MUST be the SAME secret key used by auth_service to SIGN tokens.
     # It will be provided by docker-compose using the same env var name.
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'default_jwt_secret_key_needs_change')
     JWT_ALGORITHM = "HS256" # Must match auth_service
+    # Verified tokens are cached in-process for this long (capped by the token's 'exp'); 0 disables.
+    JWT_CACHE_TTL_SECONDS = int(os.environ.get('JWT_CACHE_TTL_SECONDS', 60))
+    JWT_CACHE_MAXSIZE = int(os.environ.get('JWT_CACHE_MAXSIZE', 10000))
 
+    # Granted (user, child) access checks are cached in-process for this long; 0 disables.
+    # Each gunicorn worker has its own cache, so after a child is deleted the other workers
+    # keep granting access to it for up to this long (see routes._access_cache).
+    ACCESS_CACHE_TTL_SECONDS = int(os.environ.get('ACCESS_CACHE_TTL_SECONDS', 30))
+    ACCESS_CACHE_MAXSIZE = int(os.environ.get('ACCESS_CACHE_MAXSIZE', 50000))
+
+    # Exposes POST /internal/test-setup and /internal/test-teardown (one-request fixture
+    # setup and end-of-session cleanup for the integration tests).
+    # Dev/test only; must stay off in production.
+    ENABLE_TEST_SETUP_ENDPOINT = os.environ.get('ENABLE_TEST_SETUP_ENDPOINT', 'false').lower() in ('1', 'true', 'yes')
+
+    # Logging level for the service (DEBUG, INFO, WARNING, ...). INFO by default.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
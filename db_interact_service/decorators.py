@@ -1,15 +1,81 @@
 # --- db_interact_service/decorators.py ---
 
 import os
+import time
+import json
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify, current_app, g
 import jwt
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import OperationFailure
+
+# --- Verified Token Cache ---
+# SPAs reuse the same Bearer token for many calls, so the verified payload is
+# memoized for JWT_CACHE_TTL_SECONDS (never beyond the token's own 'exp').
+# Keyed by (sha256(token), secret, algorithm): raw tokens are not kept in memory
+# and a secret rotation never reuses entries.
+_jwt_cache = OrderedDict() # key -> (cache_expires_at, payload)
+_jwt_cache_lock = threading.Lock()
+
+def _token_cache_key(token, jwt_secret, jwt_algo):
+    """Builds the cache key for a raw token under the current secret/algorithm."""
+    return (hashlib.sha256(token.encode()).digest(), jwt_secret, jwt_algo)
+
+def _get_cached_payload(key):
+    """Returns a cached decoded payload for key, or None if missing/stale."""
+    now = time.time()
+    with _jwt_cache_lock:
+        entry = _jwt_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= now:
+            del _jwt_cache[key]
+            return None
+        _jwt_cache.move_to_end(key) # LRU: mark as recently used
+        return payload
+
+def _cache_payload(key, payload, ttl_seconds, maxsize):
+    """Stores a verified payload, bounded by both the TTL and the token's 'exp'."""
+    now = time.time()
+    expires_at = now + ttl_seconds
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        # Stop serving from cache one second before the token itself expires
+        expires_at = min(expires_at, exp - 1)
+    if expires_at <= now:
+        return
+    with _jwt_cache_lock:
+        _jwt_cache[key] = (expires_at, payload)
+        _jwt_cache.move_to_end(key)
+        while len(_jwt_cache) > maxsize:
+            _jwt_cache.popitem(last=False) # Evict least recently used
+
+def _unverified_exp(token):
+    """
+    Reads the 'exp' claim without verifying the signature (one base64 + JSON parse).
+    Only used to reject already-expired tokens cheaply; returns None if unreadable.
+    """
+    try:
+        payload_segment = token.split(".")[1]
+        payload_segment += "=" * (-len(payload_segment) % 4) # Restore base64 padding
+        exp = json.loads(base64.urlsafe_b64decode(payload_segment)).get("exp")
+    except Exception:
+        return None # Malformed: let jwt.decode produce the proper error
+    return exp if isinstance(exp, (int, float)) else None
 
 def token_required(f):
     """
     Decorator for DB Interact Service routes.
     Ensures a valid ACCESS JWT is present, validates it using the shared secret,
     and loads user info ('user_id', 'role') into Flask's 'g' object.
+    The verified claims are also stored as g.token_claims; this is the only
+    place a token is decoded during a request.
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -29,16 +95,28 @@ def token_required(f):
                 current_app.logger.critical("JWT_SECRET_KEY is not configured in DB Interact Service!")
                 return jsonify({"message": "Server configuration error"}), 500
 
-            payload = jwt.decode(
-                token,
-                jwt_secret,
-                algorithms=[jwt_algo],
-                # Optional: Validate audience/issuer
-            )
+            cache_ttl = current_app.config.get('JWT_CACHE_TTL_SECONDS', 60)
+            cache_key = _token_cache_key(token, jwt_secret, jwt_algo) if cache_ttl > 0 else None
+            payload = _get_cached_payload(cache_key) if cache_key else None
+            if payload is None:
+                # Reject expired tokens (stale sessions) before paying for signature verification
+                exp = _unverified_exp(token)
+                if exp is not None and exp < time.time():
+                    return jsonify({"message": "Access token has expired!"}), 401
+                payload = jwt.decode(
+                    token,
+                    jwt_secret,
+                    algorithms=[jwt_algo],
+                    # Optional: Validate audience/issuer
+                )
+                if cache_key:
+                    _cache_payload(cache_key, payload, cache_ttl, current_app.config.get('JWT_CACHE_MAXSIZE', 10000))
 
             if payload.get("type") != "access":
                 return jsonify({"message": "Invalid token type provided (expected access)"}), 401
 
+            # Full claims for any later consumer in this request; never decode the token again
+            g.token_claims = payload
             g.current_user_id = payload.get("sub")
             g.current_user_role = payload.get("role")
 
@@ -46,15 +124,61 @@ def token_required(f):
                  current_app.logger.warning("Token payload missing 'sub' or 'role'.")
                  return jsonify({"message": "Invalid token payload"}), 401
 
+            # Parse the subject once; DB helpers reuse it instead of re-parsing per query
+            try:
+                g.current_user_oid = ObjectId(g.current_user_id)
+            except (InvalidId, TypeError):
+                current_app.logger.warning("Token subject is not a valid ObjectId: %s", g.current_user_id)
+                return jsonify({"message": "Invalid token subject"}), 401
+
         except jwt.ExpiredSignatureError:
             return jsonify({"message": "Access token has expired!"}), 401
         except jwt.InvalidTokenError as e:
-            current_app.logger.warning(f"Invalid access token received: {e}")
+            current_app.logger.warning("Invalid access token received: %s", e)
             return jsonify({"message": "Access token is invalid!"}), 401
         except Exception as e:
-            current_app.logger.error(f"Unexpected error decoding token: {e}", exc_info=True)
+            current_app.logger.error("Unexpected error decoding token: %s", e, exc_info=True)
             return jsonify({"message": "Error processing token"}), 500
 
         return f(*args, **kwargs)
 
     return decorated_function
+
+
+def json_route(required=None, action="process request", missing_message=None):
+    """
+    Decorator for routes that take a JSON body (apply below @token_required).
+    Parses the body once, checks that the 'required' fields are present and
+    non-empty, and passes it to the route as the 'data' keyword argument.
+    'missing_message' overrides the default "Missing required fields: ..." text,
+    so routes keep the messages their callers already match on.
+    Translates the shared error triad into responses:
+      ValueError -> 400 "Failed to <action>: ...", OperationFailure -> 500, anything else -> 500.
+    """
+    required = tuple(required or ())
+    missing_message = missing_message or f"Missing required fields: {', '.join(required)}"
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not data:
+                return jsonify({"message": missing_message if required else "Missing request body"}), 400
+            for field in required:
+                if not data.get(field):
+                    return jsonify({"message": missing_message}), 400
+
+            try:
+                return f(*args, data=data, **kwargs)
+            except ValueError as e: # Catches validation errors from model
+                return jsonify({"message": f"Failed to {action}: {e}"}), 400
+            except OperationFailure as e: # Catch database errors
+                current_app.logger.error("Database error trying to %s %s: %s", action, kwargs or '', e)
+                return jsonify({"message": f"Database error: {e}"}), 500
+            except Exception as e:
+                current_app.logger.exception("Unexpected error trying to %s %s: %s", action, kwargs or '', e)
+                return jsonify({"message": "An internal server error occurred"}), 500
+
+        return decorated_function
+
+    return decorator
@@ -1,85 +1,115 @@
 # --- db_interact_service/models.py ---
 import datetime
-from pymongo import MongoClient
+from pymongo import MongoClient, ReadPreference
+from pymongo.read_concern import ReadConcern
 from pymongo.uri_parser import parse_uri
-from pymongo.errors import ConnectionFailure, OperationFailure, DuplicateKeyError
-from flask import current_app, g
+from pymongo.errors import OperationFailure, BulkWriteError
+from flask import current_app
 from bson import ObjectId # For handling MongoDB ObjectIDs
-from .utils import serialize_doc # Assuming this is a utility function to serialize MongoDB documents
-import logging # Use standard logging
+from bson.errors import InvalidId
+from .utils import serialize_doc, to_object_id
 
 # --- Database Connection Handling ---
 
-def get_db():
+# Config names accepted for MONGO_READONLY_READ_PREFERENCE
+_READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST,
+}
+
+def init_db(app):
     """
-    Opens a new database connection for the operational DB if there is
-    none yet for the current application context. Returns the database object.
-    Handles connection pooling implicitly via MongoClient.
+    Creates the single MongoClient shared by every request of this application
+    and stores it (plus the operational Database handle) in app.extensions.
+    MongoClient is thread-safe and pools connections internally, so it must be
+    created once per process rather than once per request.
     """
-    # Check if connection object already exists for this context
-    if 'operational_mongo_db' not in g:
-        mongo_uri = current_app.config['MONGO_URI']
-        try:
-            # Parse URI to get database name
-            uri_dict = parse_uri(mongo_uri)
-            db_name = uri_dict.get('database')
-            if not db_name:
-                raise ValueError(f"Operational database name not found in MONGO_URI: {mongo_uri}")
-
-            # Create client and store client and db object in Flask's 'g'
-            # Add a server selection timeout for quicker failure detection
-            g.operational_mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-            # The ismaster command is cheap and does not require auth.
-            # It forces the client to connect and check server status.
-            g.operational_mongo_client.admin.command('ismaster')
-            g.operational_mongo_db = g.operational_mongo_client[db_name]
-            current_app.logger.info(f"Connected to operational DB: {db_name}")
-
-        except ConnectionFailure as e:
-             # Handle connection error during initialization
-             current_app.logger.error(f"Operational DB connection failed: {e}")
-             g.operational_mongo_db = None # Mark as None if connection failed
-             raise ConnectionFailure(f"Could not connect to operational database: {e}")
-        except ValueError as e:
-             # Handle configuration errors (e.g., missing db name)
-             current_app.logger.error(f"Configuration error: {e}")
-             g.operational_mongo_db = None
-             raise ValueError(f"Configuration error: {e}")
-        except Exception as e:
-             # Catch other potential errors during client initialization
-             current_app.logger.error(f"Unexpected error during DB client initialization: {e}", exc_info=True)
-             g.operational_mongo_db = None
-             raise ConnectionFailure(f"Unexpected error connecting to operational database: {e}")
-
-
-    # Check if connection failed on a previous attempt within the same context
-    if g.operational_mongo_db is None:
-        # This prevents using a None object if connection failed earlier in the request
-        raise ConnectionFailure("Operational database connection previously failed in this context.")
+    mongo_uri = app.config['MONGO_URI']
+    # Resolve the database name once at startup (explicit config wins over the URI)
+    if not app.config.get('MONGO_DB_NAME'):
+        app.config['MONGO_DB_NAME'] = parse_uri(mongo_uri).get('database')
+    db_name = app.config['MONGO_DB_NAME']
+    if not db_name:
+        raise ValueError(f"Operational database name not found in MONGO_URI: {mongo_uri}")
+
+    # connect=False defers opening sockets until first use. create_app() runs no
+    # queries (indexes come from 'flask ensure-indexes'), so a gunicorn --preload
+    # master never connects and forked workers each open their own connections.
+    # Add a server selection timeout for quicker failure detection
+    client = MongoClient(
+        mongo_uri,
+        serverSelectionTimeoutMS=5000,
+        maxPoolSize=app.config.get('MONGO_MAX_POOL_SIZE', 100),
+        minPoolSize=app.config.get('MONGO_MIN_POOL_SIZE', 0),
+        socketTimeoutMS=app.config.get('MONGO_SOCKET_TIMEOUT_MS', 30000),
+        waitQueueTimeoutMS=app.config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000),
+        # Compress BSON on the wire (large activity 'details' shrink well)
+        compressors=app.config.get('MONGO_COMPRESSORS', 'zstd,zlib'),
+        zlibCompressionLevel=app.config.get('MONGO_ZLIB_COMPRESSION_LEVEL', 6),
+        connect=False
+    )
+    app.extensions['mongo_client'] = client
+    app.extensions['mongo_db'] = client[db_name]
+    # Second handle on the same pool for read-only queries that tolerate replica lag.
+    # readConcern 'local' returns the member's latest data without waiting for majority commit.
+    read_pref_name = app.config.get('MONGO_READONLY_READ_PREFERENCE', 'secondaryPreferred')
+    if read_pref_name not in _READ_PREFERENCES:
+        raise ValueError(f"Unknown MONGO_READONLY_READ_PREFERENCE: {read_pref_name}")
+    app.extensions['mongo_db_ro'] = client.get_database(
+        db_name,
+        read_preference=_READ_PREFERENCES[read_pref_name],
+        read_concern=ReadConcern(app.config.get('MONGO_READONLY_READ_CONCERN', 'local'))
+    )
+    app.logger.info("Operational DB client initialised for database: %s", db_name)
+
+def get_db(readonly: bool = False):
+    """
+    Returns the operational database object from the application-wide client.
+    Connection pooling is handled by MongoClient; no per-request setup is needed.
+    With readonly=True the handle uses MONGO_READONLY_READ_PREFERENCE and
+    MONGO_READONLY_READ_CONCERN, so reads may be served by secondaries; never use it for writes or authorization checks.
+    """
+    if readonly:
+        return current_app.extensions['mongo_db_ro']
+    return current_app.extensions['mongo_db']
 
-    # Return the database object
-    return g.operational_mongo_db
 
-def close_db(e=None):
-    """Closes the operational database connection by closing the client."""
-    # Pop the client from 'g' to ensure it's removed
-    client = g.pop('operational_mongo_client', None)
-    # Close the client if it exists (this handles connection pooling)
-    if client is not None:
-        client.close()
-        current_app.logger.info("Closed operational DB client connection.")
-    # Also pop the db object just in case
-    g.pop('operational_mongo_db', None)
+def ensure_indexes(db):
+    """
+    Creates the indexes backing the hot query paths. Idempotent: create_index
+    is a no-op when an identical index already exists.
+    """
+    # Children lists by linked parent / supervisor. The trailing keys make the
+    # list queries covered: every projected field (CHILD_LIST_PROJECTION) lives in
+    # the index, so Mongo answers from the index without fetching documents.
+    db.children.create_index([("parent_ids", 1), ("name", 1), ("birthday", 1), ("group", 1), ("_id", 1)])
+    db.children.create_index([("supervisor_ids", 1), ("name", 1), ("birthday", 1), ("group", 1), ("_id", 1)])
+    # Activities for a child by creation time (recent-activities $lookup), optionally by type
+    db.activities.create_index([("child_id", 1), ("created_at", -1)])
+    db.activities.create_index([("child_id", 1), ("type", 1), ("created_at", -1)])
+    # Paginated activity listing, Equality-Sort-Range order:
+    # child_id/type (equality), _id (keyset sort), created_at (optional date range).
+    # The index delivers the sort order and filters the date range on index keys,
+    # so no in-memory SORT stage and no fetch of out-of-range documents.
+    db.activities.create_index([("child_id", 1), ("_id", -1), ("created_at", -1)])
+    db.activities.create_index([("child_id", 1), ("type", 1), ("_id", -1), ("created_at", -1)])
 
 
 # --- Children CRUD Functions ---
 
-def create_child_record(child_data: dict, parent_id: str) -> str:
+# Fields returned by the children list endpoints (what list views render).
+# Must stay a subset of the parent_ids/supervisor_ids indexes to remain covered.
+CHILD_LIST_PROJECTION = {"_id": 1, "name": 1, "birthday": 1, "group": 1}
+
+def create_child_record(child_data: dict, parent_id: str | ObjectId) -> str:
     """Creates a new child record in the 'children' collection, associating the initial parent."""
     db = get_db()
     try:
         # Validate parent_id format before using it
-        parent_obj_id = ObjectId(parent_id)
+        parent_obj_id = to_object_id(parent_id)
 
         # Prepare child document with necessary fields
         new_child = {
@@ -90,7 +120,7 @@ def create_child_record(child_data: dict, parent_id: str) -> str:
             "notes": child_data.get("notes", ""),       # Default to empty string if not provided
             "parent_ids": [parent_obj_id],              # Link initial parent ObjectId
             "supervisor_ids": [],                       # Initialize empty list for supervisors
-            "created_at": datetime.datetime.utcnow()    # Record creation timestamp
+            "created_at": datetime.datetime.now(datetime.timezone.utc)    # Record creation timestamp
         }
         # Basic validation for required fields
         if not new_child["name"] or not new_child["birthday"]:
@@ -103,30 +133,37 @@ def create_child_record(child_data: dict, parent_id: str) -> str:
         return str(result.inserted_id)
     except OperationFailure as e:
         # Handle potential MongoDB operation errors (e.g., network issues, write concerns)
-        current_app.logger.error(f"Database error creating child record: {e}")
+        current_app.logger.error("Database error creating child record: %s", e)
         raise # Re-raise database errors to be handled by the route
     except (ValueError, TypeError) as e:
         # Handle validation errors (missing fields, bad data types)
-        current_app.logger.error(f"Validation error during child creation: {e}")
+        current_app.logger.error("Validation error during child creation: %s", e)
         raise ValueError(f"Invalid data for child creation: {e}")
     except Exception as e: # Catch ObjectId conversion errors etc.
-        current_app.logger.error(f"Unexpected error processing child creation: {e}", exc_info=True)
+        current_app.logger.error("Unexpected error processing child creation: %s", e, exc_info=True)
         # Re-raise as ValueError for consistency in route handling
         raise ValueError(f"Error processing child creation: {e}")
 
 
-def get_child_by_id(child_id: str) -> dict | None:
-    """Gets a child document from the 'children' collection by its ID string."""
-    db = get_db()
+def get_child_by_id(child_id: str | ObjectId, projection: dict | None = None, readonly: bool = True) -> dict | None:
+    """
+    Gets a child document from the 'children' collection by its ID (string or ObjectId).
+    An optional projection limits the returned fields (default: full document).
+    Pass readonly=False when the result feeds a write decision (reads the primary).
+    """
+    db = get_db(readonly=readonly)
     try:
-        # Convert string ID to ObjectId for querying
-        obj_id = ObjectId(child_id)
-        child = db.children.find_one({"_id": obj_id})
+        # Convert string ID to ObjectId for querying (already-parsed ObjectIds are reused)
+        obj_id = to_object_id(child_id)
+        child = db.children.find_one({"_id": obj_id}, projection)
         # Serialize the document (convert ObjectIds to strings) before returning
         return serialize_doc(child)
-    except Exception as e: # Handles invalid ObjectId format or other errors
-        current_app.logger.warning(f"Error finding child by ID {child_id}: {e}")
+    except (InvalidId, TypeError): # Invalid ObjectId format: no such child
+        current_app.logger.warning("Invalid child ID format: %s", child_id)
         return None
+    except OperationFailure as e:
+        current_app.logger.error("Database error finding child by ID %s: %s", child_id, e)
+        raise # Re-raise DB errors
 
 def update_child_details(child_id: str, update_data: dict) -> bool:
     """Updates specific allowed fields of a child's profile in the 'children' collection."""
@@ -145,7 +182,7 @@ def update_child_details(child_id: str, update_data: dict) -> bool:
 
     # If no valid fields were provided for update, return False
     if not updated:
-        current_app.logger.info(f"No valid fields provided for updating child {child_id}")
+        current_app.logger.info("No valid fields provided for updating child %s", child_id)
         return False
 
     try:
@@ -155,10 +192,10 @@ def update_child_details(child_id: str, update_data: dict) -> bool:
         # Return True if a document was found (matched_count > 0)
         return result.matched_count > 0
     except OperationFailure as e:
-        current_app.logger.error(f"Database error updating child details {child_id}: {e}")
+        current_app.logger.error("Database error updating child details %s: %s", child_id, e)
         raise
-    except Exception as e: # Invalid ObjectId format or other error
-        current_app.logger.warning(f"Error updating child details {child_id}: {e}")
+    except (InvalidId, TypeError): # Invalid ObjectId format: no such child
+        current_app.logger.warning("Invalid child ID format for update: %s", child_id)
         return False
 
 def link_supervisor_to_child(child_id: str, supervisor_id: str) -> bool:
@@ -177,81 +214,167 @@ def link_supervisor_to_child(child_id: str, supervisor_id: str) -> bool:
         # modified_count will be 0 if the supervisor was already in the set.
         return result.matched_count > 0
     except OperationFailure as e:
-        current_app.logger.error(f"Database error linking supervisor {supervisor_id} to child {child_id}: {e}")
+        current_app.logger.error("Database error linking supervisor %s to child %s: %s", supervisor_id, child_id, e)
         raise
-    except Exception as e: # Invalid ObjectId format or other error
-        current_app.logger.warning(f"Error linking supervisor: {e}")
+    except (InvalidId, TypeError) as e: # Invalid ObjectId format
+        current_app.logger.warning("Error linking supervisor: %s", e)
         return False
 
 # --- Authorization Helper Functions ---
 
-def is_parent_of(user_id: str, child_id: str) -> bool:
-    """Checks if the user_id is listed in the child's parent_ids."""
-    db = get_db()
-    try:
-        child_obj_id = ObjectId(child_id)
-        user_obj_id = ObjectId(user_id)
-        # Efficiently check for existence using count_documents (or find_one with projection)
-        count = db.children.count_documents({"_id": child_obj_id, "parent_ids": user_obj_id})
-        return count > 0
-    except Exception as e: # Invalid ObjectId format or other DB error
-        current_app.logger.error(f"Error checking parent relationship (user: {user_id}, child: {child_id}): {e}")
-        return False
+# Maps a token role to the child field that links users of that role
+_ROLE_LINK_FIELDS = {
+    'parent': 'parent_ids',
+    'teacher': 'supervisor_ids',
+}
 
-def is_supervisor_of(user_id: str, child_id: str) -> bool:
-    """Checks if the user_id is listed in the child's supervisor_ids."""
+def user_can_access_child(user_id: str | ObjectId, child_id: str | ObjectId, role: str) -> bool:
+    """
+    Checks in one indexed find_one whether the user is linked to the child
+    through the field matching their role (parent_ids or supervisor_ids).
+    """
+    link_field = _ROLE_LINK_FIELDS.get(role)
+    if not link_field:
+        return False
     db = get_db()
     try:
-        child_obj_id = ObjectId(child_id)
-        user_obj_id = ObjectId(user_id)
-        # Efficiently check for existence
-        count = db.children.count_documents({"_id": child_obj_id, "supervisor_ids": user_obj_id})
-        return count > 0
-    except Exception as e: # Invalid ObjectId format or other DB error
-        current_app.logger.error(f"Error checking supervisor relationship (user: {user_id}, child: {child_id}): {e}")
+        child_obj_id = to_object_id(child_id)
+        user_obj_id = to_object_id(user_id)
+        return db.children.find_one({"_id": child_obj_id, link_field: user_obj_id}, {"_id": 1}) is not None
+    except (InvalidId, TypeError): # Invalid ObjectId format: cannot be linked
+        current_app.logger.warning("Invalid ID format checking access (user: %s, child: %s)", user_id, child_id)
+        return False
+    except OperationFailure as e: # Deny access on DB errors
+        current_app.logger.error("Database error checking access (user: %s, child: %s): %s", user_id, child_id, e)
         return False
 
 # --- Functions to get associated children ---
 
-def get_children_for_parent(parent_id: str) -> list[dict]:
-    """Gets basic info (_id, name) for children associated with a parent."""
-    db = get_db()
+def get_children_for_parent(parent_id: str | ObjectId) -> list[dict]:
+    """
+    Gets basic info (_id, name, birthday, group) for children associated with a parent.
+    Served from the covering index on parent_ids (no document fetch).
+    Returns raw documents (ObjectId _id); encode with utils.mongo_jsonify.
+    """
+    db = get_db(readonly=True)
     try:
-        parent_obj_id = ObjectId(parent_id)
+        parent_obj_id = to_object_id(parent_id)
         # Find children where parent_id is in the parent_ids array
-        # Project only the _id and name fields for efficiency
+        # Project only the list fields so the query is covered by the index
         children_cursor = db.children.find(
             {"parent_ids": parent_obj_id},
-            {"_id": 1, "name": 1} # Projection: only return ID and name
+            CHILD_LIST_PROJECTION
         )
-        # Serialize the results (_id to string)
-        children_list = [serialize_doc(child) for child in children_cursor]
-        return children_list
-    except Exception as e: # Invalid ObjectId format or other DB error
-        current_app.logger.error(f"Error getting children for parent {parent_id}: {e}")
+        # Raw documents; ObjectIds are converted when the response is encoded (utils.mongo_jsonify)
+        return list(children_cursor)
+    except (InvalidId, TypeError): # Invalid ObjectId format: no linked children
+        current_app.logger.warning("Invalid parent ID format: %s", parent_id)
         return []
+    except OperationFailure as e:
+        current_app.logger.error("Database error getting children for parent %s: %s", parent_id, e)
+        raise # Re-raise DB errors
 
-def get_children_for_supervisor(supervisor_id: str) -> list[dict]:
-    """Gets basic info (_id, name) for children associated with a supervisor."""
-    db = get_db()
+def get_children_for_supervisor(supervisor_id: str | ObjectId) -> list[dict]:
+    """
+    Gets basic info (_id, name, birthday, group) for children associated with a supervisor.
+    Served from the covering index on supervisor_ids (no document fetch).
+    Returns raw documents (ObjectId _id); encode with utils.mongo_jsonify.
+    """
+    db = get_db(readonly=True)
     try:
-        supervisor_obj_id = ObjectId(supervisor_id)
+        supervisor_obj_id = to_object_id(supervisor_id)
         # Find children where supervisor_id is in the supervisor_ids array
-        # Project only _id and name
+        # Project only the list fields so the query is covered by the index
         children_cursor = db.children.find(
             {"supervisor_ids": supervisor_obj_id},
-            {"_id": 1, "name": 1} # Projection
+            CHILD_LIST_PROJECTION
         )
-        # Serialize the results
-        children_list = [serialize_doc(child) for child in children_cursor]
-        return children_list
-    except Exception as e: # Invalid ObjectId format or other DB error
-        current_app.logger.error(f"Error getting children for supervisor {supervisor_id}: {e}")
+        # Raw documents; ObjectIds are converted when the response is encoded (utils.mongo_jsonify)
+        return list(children_cursor)
+    except (InvalidId, TypeError): # Invalid ObjectId format: no linked children
+        current_app.logger.warning("Invalid supervisor ID format: %s", supervisor_id)
         return []
+    except OperationFailure as e:
+        current_app.logger.error("Database error getting children for supervisor %s: %s", supervisor_id, e)
+        raise # Re-raise DB errors
+
+
+def get_children_with_recent_activities(user_id: str | ObjectId, role: str = 'parent', limit: int = 5) -> list[dict]:
+    """
+    Gets basic info (_id, name) for children associated with a user plus each
+    child's most recent activities, in a single aggregation round-trip.
+    Returns raw documents; encode with utils.mongo_jsonify.
+    """
+    link_field = _ROLE_LINK_FIELDS.get(role)
+    if not link_field:
+        return []
+    db = get_db(readonly=True)
+    try:
+        user_obj_id = to_object_id(user_id)
+        pipeline = [
+            {"$match": {link_field: user_obj_id}},
+            # Join the newest activities of each child server-side
+            {"$lookup": {
+                "from": "activities",
+                "let": {"cid": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$child_id", "$$cid"]}}},
+                    {"$sort": {"created_at": -1}},
+                    {"$limit": limit},
+                    {"$project": {"type": 1, "details": 1, "created_at": 1}}
+                ],
+                "as": "recent"
+            }},
+            {"$project": {"name": 1, "recent": 1}}
+        ]
+        # Raw documents; ObjectIds are converted when the response is encoded (utils.mongo_jsonify)
+        return list(db.children.aggregate(pipeline))
+    except (InvalidId, TypeError): # Invalid ObjectId format: no linked children
+        current_app.logger.warning("Invalid user ID format: %s", user_id)
+        return []
+    except OperationFailure as e:
+        current_app.logger.error("Database error getting children with recent activities for user %s: %s", user_id, e)
+        raise # Re-raise DB errors
 
 
 # --- Activities CRUD Functions (Includes Drawings as type='drawing') ---
 
+def _prepare_activity_doc(activity_data: dict) -> dict:
+    """
+    Validates an activity dict and converts it in place into the stored document
+    (ObjectId child_id/logged_by, default created_at). Raises ValueError/TypeError.
+    """
+    # --- Validation ---
+    required_fields = ['child_id', 'type', 'details', 'logged_by']
+    missing = [field for field in required_fields if not activity_data.get(field)]
+    if missing:
+        raise ValueError(f"Missing required fields for activity: {', '.join(missing)}")
+
+    # Validate ObjectId formats
+    child_obj_id = ObjectId(activity_data['child_id'])
+    logged_by_obj_id = to_object_id(activity_data['logged_by'])
+
+    # Ensure details is a dictionary (or handle other types if needed)
+    if not isinstance(activity_data['details'], dict):
+         raise ValueError("Activity 'details' must be an object/dictionary")
+
+    # Add specific validation based on type if necessary
+    activity_type = activity_data['type']
+    if activity_type == 'drawing':
+        if not activity_data['details'].get('image_url'):
+             raise ValueError("Missing 'image_url' in details for drawing activity")
+    # Add more type-specific validations here...
+
+    # --- Preparation ---
+    # Ensure creation timestamp is set
+    if 'created_at' not in activity_data:
+        activity_data['created_at'] = datetime.datetime.now(datetime.timezone.utc)
+
+    # Ensure IDs are stored as ObjectIds
+    activity_data['child_id'] = child_obj_id
+    activity_data['logged_by'] = logged_by_obj_id
+    return activity_data
+
 def add_activity_record(activity_data: dict) -> str:
     """
     Adds a generic activity record (meal, sleep, behavior, drawing, etc.)
@@ -259,128 +382,195 @@ def add_activity_record(activity_data: dict) -> str:
     """
     db = get_db()
     try:
-        # --- Validation ---
-        required_fields = ['child_id', 'type', 'details', 'logged_by']
-        missing = [field for field in required_fields if not activity_data.get(field)]
-        if missing:
-            raise ValueError(f"Missing required fields for activity: {', '.join(missing)}")
-
-        # Validate ObjectId formats
-        child_obj_id = ObjectId(activity_data['child_id'])
-        logged_by_obj_id = ObjectId(activity_data['logged_by'])
-
-        # Ensure details is a dictionary (or handle other types if needed)
-        if not isinstance(activity_data['details'], dict):
-             raise ValueError("Activity 'details' must be an object/dictionary")
-
-        # Add specific validation based on type if necessary
-        activity_type = activity_data['type']
-        if activity_type == 'drawing':
-            if not activity_data['details'].get('image_url'):
-                 raise ValueError("Missing 'image_url' in details for drawing activity")
-        # Add more type-specific validations here...
-
-        # --- Preparation ---
-        # Ensure creation timestamp is set
-        if 'created_at' not in activity_data:
-            activity_data['created_at'] = datetime.datetime.utcnow()
-
-        # Ensure IDs are stored as ObjectIds
-        activity_data['child_id'] = child_obj_id
-        activity_data['logged_by'] = logged_by_obj_id
+        activity_doc = _prepare_activity_doc(activity_data)
 
         # --- Insertion ---
-        result = db.activities.insert_one(activity_data)
+        result = db.activities.insert_one(activity_doc)
         return str(result.inserted_id)
 
     except OperationFailure as e:
-        current_app.logger.error(f"Database error adding activity: {e}")
+        current_app.logger.error("Database error adding activity: %s", e)
         raise # Re-raise DB errors
-    except (ValueError, TypeError) as e: # Catch validation and ObjectId errors
-        current_app.logger.error(f"Validation error adding activity: {e}")
+    except (ValueError, TypeError, InvalidId) as e: # Catch validation and ObjectId errors
+        current_app.logger.error("Validation error adding activity: %s", e)
         raise ValueError(f"Invalid data for activity creation: {e}") # Re-raise as ValueError
     except Exception as e:
-        current_app.logger.error(f"Unexpected error adding activity: {e}", exc_info=True)
+        current_app.logger.error("Unexpected error adding activity: %s", e, exc_info=True)
         raise ValueError(f"Unexpected error processing activity: {e}")
 
-
-def get_activities_for_child(child_id: str, activity_type: str = None, start_date: datetime.datetime = None, end_date: datetime.datetime = None) -> list[dict]:
+def add_activity_records(activities_data: list[dict]) -> list[str]:
     """
-    Gets activity records for a specific child from the 'activities' collection,
-    optionally filtered by activity type and date range.
+    Adds several activity records in one bulk insert (one round-trip).
+    All records are validated first; if any is invalid nothing is inserted.
+    Returns the inserted IDs in input order.
     """
     db = get_db()
-    try:
-        # Validate child_id format first
-        obj_id = ObjectId(child_id)
-        query = {"child_id": obj_id} # Query using ObjectId
-
-        # Add optional filters to the query
-        if activity_type:
-            # Allow filtering by a list of types if needed in future
-            if isinstance(activity_type, list):
-                 query["type"] = {"$in": activity_type}
-            else:
-                 query["type"] = activity_type
-
-        # Build date range filter
-        date_filter = {}
-        if start_date:
-            date_filter["$gte"] = start_date
-        if end_date:
-            # Ensure end_date is exclusive ($lt)
-            date_filter["$lt"] = end_date
-        if date_filter:
-            query["created_at"] = date_filter
-
-        # Execute query and sort by creation time descending (newest first)
-        activities_cursor = db.activities.find(query).sort("created_at", -1)
-
-        # Serialize results before returning
-        return [serialize_doc(activity) for activity in activities_cursor]
+    activity_docs = []
+    for index, activity_data in enumerate(activities_data):
+        try:
+            activity_docs.append(_prepare_activity_doc(activity_data))
+        except (ValueError, TypeError, InvalidId) as e: # Catch validation and ObjectId errors
+            current_app.logger.error("Validation error adding activity at index %s: %s", index, e)
+            raise ValueError(f"Invalid data for activity at index {index}: {e}")
+        except Exception as e:
+            current_app.logger.error("Unexpected error adding activity at index %s: %s", index, e, exc_info=True)
+            raise ValueError(f"Unexpected error processing activity at index {index}: {e}")
+
+    if not activity_docs:
+        raise ValueError("No activities provided")
 
+    try:
+        # Unordered: the server keeps inserting past a failed document
+        result = db.activities.insert_many(activity_docs, ordered=False)
+        return [str(inserted_id) for inserted_id in result.inserted_ids]
+    except BulkWriteError as e:
+        # Log which documents failed; the route reports them back to the caller
+        for write_error in e.details.get('writeErrors', []):
+            current_app.logger.error("Bulk activity insert failed at index %s: %s", write_error.get('index'), write_error.get('errmsg'))
+        raise
     except OperationFailure as e:
-        current_app.logger.error(f"Database error getting activities for child {child_id}: {e}")
+        current_app.logger.error("Database error adding activities: %s", e)
         raise # Re-raise DB errors
+
+
+def _build_activities_query(child_id: str | ObjectId, activity_type: str = None, start_date: datetime.datetime = None, end_date: datetime.datetime = None, before_id: str | ObjectId = None) -> dict:
+    """Builds the activities filter for a child. Raises on invalid ObjectId strings."""
+    # Validate child_id format first (already-parsed ObjectIds are reused)
+    obj_id = to_object_id(child_id)
+    query = {"child_id": obj_id} # Query using ObjectId
+
+    # Add optional filters to the query
+    if activity_type:
+        # Allow filtering by a list of types if needed in future
+        if isinstance(activity_type, list):
+             query["type"] = {"$in": activity_type}
+        else:
+             query["type"] = activity_type
+
+    # Build date range filter
+    date_filter = {}
+    if start_date:
+        date_filter["$gte"] = start_date
+    if end_date:
+        # Ensure end_date is exclusive ($lt)
+        date_filter["$lt"] = end_date
+    if date_filter:
+        query["created_at"] = date_filter
+
+    # Keyset pagination on the monotonic _id (no server-side skip scan)
+    if before_id:
+        query["_id"] = {"$lt": to_object_id(before_id)}
+    return query
+
+def stream_activities_for_child(child_id: str | ObjectId, activity_type: str = None, start_date: datetime.datetime = None, end_date: datetime.datetime = None, limit: int = 0, before_id: str | ObjectId = None, projection: dict | None = None, batch_size: int = 500, sort_field: str = "_id"):
+    """
+    Gets activity records for a specific child from the 'activities' collection,
+    optionally filtered by activity type and date range, newest first by 'sort_field'
+    ('_id' for keyset pages, 'created_at' for full listings).
+    'limit' caps the number of records (0 means no limit) and 'before_id' (the last
+    _id of the previous page, with sort_field '_id') fetches the next page. An optional projection limits
+    the returned fields (default: full documents).
+    Returns the lazy cursor rather than a list, so large histories can be encoded
+    or streamed with flat memory; documents are fetched in batches of 'batch_size'.
+    Raw documents; encode with the utils.mongo_* helpers.
+    """
+    db = get_db(readonly=True)
+    try:
+        query = _build_activities_query(child_id, activity_type, start_date, end_date, before_id)
     except Exception as e: # Invalid ObjectId or other error
-        current_app.logger.error(f"Error getting activities for child {child_id}: {e}")
-        # Re-raise as ValueError for consistency
+        current_app.logger.error("Error getting activities for child %s: %s", child_id, e)
         raise ValueError(f"Invalid parameters for getting activities: {e}")
 
-def get_activity_by_id(activity_id: str) -> dict | None:
-    """Gets a single activity document from the 'activities' collection by its ID."""
-    db = get_db()
+    # No round-trip happens until the caller starts iterating
+    return (
+        db.activities.find(query, projection)
+        .sort(sort_field, -1)
+        .limit(limit)
+        .batch_size(batch_size)
+    )
+
+def get_activity_by_id(activity_id: str, projection: dict | None = None, readonly: bool = True) -> dict | None:
+    """
+    Gets a single activity document from the 'activities' collection by its ID.
+    Pass readonly=False when the result feeds a write decision (reads the primary).
+    """
+    db = get_db(readonly=readonly)
     try:
         obj_id = ObjectId(activity_id)
-        activity = db.activities.find_one({"_id": obj_id})
+        activity = db.activities.find_one({"_id": obj_id}, projection)
         return serialize_doc(activity) # Serialize before returning
-    except Exception as e: # Invalid ObjectId format or DB error
-        current_app.logger.warning(f"Error finding activity by ID {activity_id}: {e}")
+    except (InvalidId, TypeError): # Invalid ObjectId format: no such activity
+        current_app.logger.warning("Invalid activity ID format: %s", activity_id)
         return None
+    except OperationFailure as e:
+        current_app.logger.error("Database error finding activity by ID %s: %s", activity_id, e)
+        raise # Re-raise DB errors
 
-def delete_activity_record(activity_id: str) -> bool:
+def delete_activity_if_supervised(activity_id: str, supervisor_id: str | ObjectId) -> dict | None:
     """
-    Deletes a single activity record from the 'activities' collection by its ID.
-    Returns True if an activity was deleted, False otherwise.
+    Deletes an activity only if it belongs to a child the supervisor is linked to.
+    Two O(1) round-trips regardless of the supervisor's caseload: one aggregation
+    reads the activity's child_id and joins that single child on _id + supervisor_ids
+    ($lookup with localField and pipeline, MongoDB >= 5.0), then find_one_and_delete
+    removes the activity only while it still belongs to that child.
+    Returns the deleted activity (_id, child_id) or None if nothing matched
+    (activity missing or not supervised by this user).
     """
     db = get_db()
     try:
         obj_id = ObjectId(activity_id)
-        # Perform the delete operation
-        result = db.activities.delete_one({"_id": obj_id})
-        # Check if a document was actually deleted
-        if result.deleted_count > 0:
-            current_app.logger.info(f"Deleted activity record with ID: {activity_id}")
-            return True
-        else:
-            # Activity ID was valid format, but no document found
-            current_app.logger.warning(f"Attempted to delete non-existent activity: {activity_id}")
-            return False
+        supervisor_obj_id = to_object_id(supervisor_id)
+        match = next(db.activities.aggregate([
+            {"$match": {"_id": obj_id}},
+            {"$project": {"child_id": 1}},
+            {"$lookup": {
+                "from": "children",
+                "localField": "child_id",
+                "foreignField": "_id",
+                "pipeline": [{"$match": {"supervisor_ids": supervisor_obj_id}}, {"$project": {"_id": 1}}],
+                "as": "supervised_child",
+            }},
+        ]), None)
+        if not match or not match["supervised_child"]:
+            return None
+        # child_id in the filter: the activity is only deleted if it was not moved meanwhile
+        deleted = db.activities.find_one_and_delete(
+            {"_id": obj_id, "child_id": match["child_id"]},
+            projection={"_id": 1, "child_id": 1}
+        )
+        if deleted:
+            current_app.logger.info("Deleted activity record with ID: %s", activity_id)
+        return serialize_doc(deleted)
+    except (InvalidId, TypeError): # Invalid ObjectId format
+        current_app.logger.warning("Invalid ID format for supervised deletion (activity: %s, supervisor: %s)", activity_id, supervisor_id)
+        return None
     except OperationFailure as e:
-        current_app.logger.error(f"Database error deleting activity {activity_id}: {e}")
+        current_app.logger.error("Database error deleting activity %s: %s", activity_id, e)
         raise # Re-raise DB errors
-    except Exception as e: # Invalid ObjectId format or other error
-        current_app.logger.error(f"Error deleting activity {activity_id}: {e}")
-        # Treat invalid ID format as non-existent for deletion purposes
-        return False
 
+
+def delete_children_of_parent(child_ids: list, parent_id: str | ObjectId) -> tuple[int, int]:
+    """
+    Deletes the given children that belong to the parent, together with all their
+    activities (two delete_many round-trips). Children of other parents are left alone.
+    Returns (children_deleted, activities_deleted). Raises ValueError on malformed IDs.
+    """
+    db = get_db()
+    try:
+        parent_obj_id = to_object_id(parent_id)
+        child_obj_ids = [to_object_id(child_id) for child_id in child_ids]
+    except (InvalidId, TypeError) as e:
+        raise ValueError(f"Invalid ID format: {e}")
+    try:
+        # Ownership is part of the filter: only this parent's children are considered
+        owned_ids = [child["_id"] for child in db.children.find({"_id": {"$in": child_obj_ids}, "parent_ids": parent_obj_id}, {"_id": 1})]
+        if not owned_ids:
+            return 0, 0
+        # Activities first, so a failure in between never leaves orphaned activities
+        activities_deleted = db.activities.delete_many({"child_id": {"$in": owned_ids}}).deleted_count
+        children_deleted = db.children.delete_many({"_id": {"$in": owned_ids}}).deleted_count
+        current_app.logger.info("Deleted %d children and %d activities for parent %s", children_deleted, activities_deleted, parent_id)
+        return children_deleted, activities_deleted
+    except OperationFailure as e:
+        current_app.logger.error("Database error deleting children of parent %s: %s", parent_id, e)
+        raise # Re-raise DB errors
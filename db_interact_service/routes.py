@@ -1,43 +1,155 @@
 # --- db_interact_service/routes.py ---
 
-from flask import Blueprint, request, jsonify, g, current_app
-from .decorators import token_required
+from flask import Blueprint, request, jsonify, g, current_app, url_for
+from .decorators import token_required, json_route
+from .utils import mongo_jsonify, mongo_ndjson_stream, mongo_json_array_stream, _parse_ymd
 # Import CRUD functions and authorization helpers from models
-from .models import *
-from pymongo.errors import OperationFailure
+from .models import (
+    create_child_record,
+    get_child_by_id,
+    update_child_details,
+    link_supervisor_to_child,
+    user_can_access_child,
+    get_children_for_parent,
+    get_children_for_supervisor,
+    get_children_with_recent_activities,
+    add_activity_record,
+    add_activity_records,
+    stream_activities_for_child,
+    get_activity_by_id,
+    delete_activity_if_supervised,
+    delete_children_of_parent,
+)
+from pymongo.errors import OperationFailure, BulkWriteError
 from bson import ObjectId # To validate ObjectIds if needed
+from bson.errors import InvalidId
 import datetime
-import traceback # For logging stack traces
+import re
+import time
+import threading
+from collections import OrderedDict
 
 # Create Blueprints:
 # 'internal' for routes primarily called service-to-service
 # 'data' for routes potentially exposed via API Gateway to frontend
 internal_bp = Blueprint('internal', __name__, url_prefix='/internal')
 data_bp = Blueprint('data', __name__, url_prefix='/data')
+# 'testing' for dev/test-only helpers; only registered when ENABLE_TEST_SETUP_ENDPOINT is set
+testing_bp = Blueprint('testing', __name__, url_prefix='/internal')
 
+# Page size bounds for activity listings
+ACTIVITIES_DEFAULT_LIMIT = 50
+ACTIVITIES_MAX_LIMIT = 500
+# Maximum number of activities accepted by one batch insert
+ACTIVITIES_MAX_BATCH = 500
+
+
+# --- Helper Function for Field Selection ---
+# Plain (dotted) field names only: no '$' operators or empty path segments
+FIELD_NAME_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+def parse_fields_param(fields_str):
+    """
+    Turns a comma-separated 'fields' query parameter (e.g. 'type,created_at,details.summary')
+    into a MongoDB inclusion projection. Returns None (full documents) when not provided.
+    Raises ValueError for a field name that is not a plain (dotted) name.
+    """
+    if not fields_str:
+        return None
+    fields = [field.strip() for field in fields_str.split(',') if field.strip()]
+    if not fields:
+        return None
+    for field in fields:
+        if not FIELD_NAME_RE.fullmatch(field):
+            raise ValueError(f"Invalid field name: {field}")
+    return {field: 1 for field in fields}
+
+# --- Helper Function for ID Parsing ---
+def parse_object_id(value):
+    """
+    Parses an ID from the URL/query string once. Returns the ObjectId, or None
+    if the value is malformed, so handlers can pass the parsed ObjectId down to
+    the authorization check and the model instead of re-parsing the string.
+    """
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+# --- Access Grant Cache ---
+# Chatty clients re-check the same (user, child) pair many times a minute.
+# Only grants are cached: a freshly linked user is never stuck with a cached
+# denial. The cache is per process: when children are deleted (only the test
+# teardown does), _forget_child_access clears the grants of the worker that
+# handled the request, while the other gunicorn workers keep them for up to
+# ACCESS_CACHE_TTL_SECONDS. That window is accepted: the cache only guards the
+# read routes, which then find no child (404) or no activities (empty list).
+# Anything that removes links must stay within the same window.
+_access_cache = OrderedDict() # (user_oid, role, child_oid) -> cache_expires_at
+_access_cache_lock = threading.Lock()
+
+def _access_cached(key):
+    """Returns True if a non-expired grant is cached for key."""
+    now = time.monotonic()
+    with _access_cache_lock:
+        expires_at = _access_cache.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= now:
+            del _access_cache[key]
+            return False
+        _access_cache.move_to_end(key) # LRU: mark as recently used
+        return True
+
+def _cache_access(key):
+    """Caches a grant for ACCESS_CACHE_TTL_SECONDS."""
+    ttl = current_app.config.get('ACCESS_CACHE_TTL_SECONDS', 30)
+    if ttl <= 0:
+        return
+    maxsize = current_app.config.get('ACCESS_CACHE_MAXSIZE', 50000)
+    with _access_cache_lock:
+        _access_cache[key] = time.monotonic() + ttl
+        _access_cache.move_to_end(key)
+        while len(_access_cache) > maxsize:
+            _access_cache.popitem(last=False) # Evict least recently used
+
+def _forget_child_access(child_oids):
+    """Drops every grant for the given children from this process's cache (e.g. after deleting them)."""
+    child_oids = set(child_oids)
+    if not child_oids:
+        return
+    with _access_cache_lock:
+        for key in [key for key in _access_cache if key[2] in child_oids]:
+            del _access_cache[key]
 
 # --- Helper Function for Authorization ---
-def check_child_access(child_id):
+def check_child_access(child_oid):
     """
     Checks if the current user (identified by token data in 'g')
-    is authorized to access data related to the given child_id.
+    is authorized to access data related to the given child.
+    child_oid is the ObjectId already parsed by the route (see parse_object_id).
     Returns True if authorized, False otherwise.
     """
     user_id = getattr(g, 'current_user_id', None)
+    user_oid = getattr(g, 'current_user_oid', None) # Parsed once by token_required
     user_role = getattr(g, 'current_user_role', None)
 
     # Basic validation of inputs
-    if not user_id or not child_id:
+    if user_oid is None or child_oid is None:
         current_app.logger.warning("Authorization check failed: Missing user_id or child_id in request context or parameters.")
         return False
 
+    # Recently granted access is served from the cache without a DB round-trip
+    cache_key = (user_oid, user_role, child_oid)
+    if _access_cached(cache_key):
+        return True
+
     # Attempt authorization checks, handle potential errors (e.g., invalid ObjectId)
     try:
-        # Teachers/Supervisors check if they are linked to the child
-        if user_role == 'teacher' and is_supervisor_of(user_id, child_id):
-            return True
-        # Parents check if they are linked to the child
-        if user_role == 'parent' and is_parent_of(user_id, child_id):
+        # Teachers/Supervisors and Parents check if they are linked to the child
+        # (one find_one, the linking field is chosen by role)
+        if user_can_access_child(user_oid, child_oid, user_role):
+            _cache_access(cache_key)
             return True
         # Add other roles like 'admin' if needed
         # if user_role == 'admin':
@@ -45,18 +157,20 @@ def check_child_access(child_id):
 
     except Exception as e:
         # Log any error during the database check (e.g., invalid ID format passed to ObjectId)
-        current_app.logger.error(f"Error during authorization check for child {child_id}, user {user_id}: {e}")
+        current_app.logger.error("Error during authorization check for child %s, user %s: %s", child_oid, user_id, e)
         return False # Deny access if checks fail due to error
 
     # Deny access if none of the conditions are met
-    current_app.logger.warning(f"Authorization denied for user {user_id} (role: {user_role}) on child {child_id}")
+    current_app.logger.warning("Authorization denied for user %s (role: %s) on child %s", user_id, user_role, child_oid)
     return False
 
 # --- Internal Children Routes (Called by other services) ---
 
 @internal_bp.route('/children', methods=['POST'])
 @token_required # Ensure caller service provides a valid token
-def handle_create_child():
+@json_route(required=['name', 'birthday'], action="create child",
+            missing_message="Missing required fields from calling service: name, birthday")
+def handle_create_child(data):
     """
     (Internal) Creates a new child record.
     Expects the calling service (e.g., child-profile-service) to have
@@ -70,131 +184,166 @@ def handle_create_child():
     if user_role != 'parent':
          return jsonify({"message": "Unauthorized: Only parents can initiate child creation"}), 403
 
-    data = request.get_json()
-    # Validate required fields passed from the calling service
-    if not data or not data.get('name') or not data.get('birthday'):
-        return jsonify({"message": "Missing required fields from calling service: name, birthday"}), 400
-
-    try:
-        # Pass the validated parent_id from the token to link the child
-        child_id = create_child_record(data, parent_id=user_id)
-        current_app.logger.info(f"Child record created with ID: {child_id} by parent {user_id}")
-        return jsonify({"message": "Child record created", "child_id": child_id}), 201
-    except ValueError as e: # Catches validation errors from model
-        return jsonify({"message": f"Failed to create child: {e}"}), 400
-    except OperationFailure as e: # Catch database errors
-        current_app.logger.error(f"Database error creating child: {e}")
-        return jsonify({"message": f"Database error: {e}"}), 500
-    except Exception as e:
-        current_app.logger.error(f"Unexpected error creating child: {e}\n{traceback.format_exc()}")
-        return jsonify({"message": "An internal server error occurred"}), 500
+    # Pass the validated parent_id from the token to link the child
+    child_id = create_child_record(data, parent_id=g.current_user_oid)
+    current_app.logger.info("Child record created with ID: %s by parent %s", child_id, user_id)
+    return jsonify({"message": "Child record created", "child_id": child_id}), 201
 
 @internal_bp.route('/children/<child_id>', methods=['PUT'])
 @token_required # Ensure caller service provides a valid token
-def handle_update_child(child_id):
+@json_route(action="update child")
+def handle_update_child(child_id, data):
     """
     (Internal) Updates child details (group, allergies, notes, name, birthday).
     Expects the calling service (e.g., child-profile-service) to have
     verified that the user performing the action has permission to update this child.
     """
-    # The calling service MUST verify permissions before calling this.
-    data = request.get_json()
-    if not data:
-        return jsonify({"message": "Missing request body"}), 400
+    # Reject malformed IDs without touching the DB
+    if not ObjectId.is_valid(child_id):
+        return jsonify({"message": "Invalid child_id format"}), 400
 
-    try:
-        # Validate child_id format before proceeding
-        ObjectId(child_id)
-        success = update_child_details(child_id, data)
-        if success:
-            current_app.logger.info(f"Child details updated for ID: {child_id}")
-            return jsonify({"message": "Child details updated"}), 200
-        else:
-            # Check if child exists to differentiate between not found and no valid fields
-            if get_child_by_id(child_id):
-                 current_app.logger.warning(f"Update failed for child {child_id}: No valid fields or data unchanged.")
-                 return jsonify({"message": "No valid fields provided for update or update failed"}), 400
-            else:
-                 current_app.logger.warning(f"Update failed for child {child_id}: Child not found.")
-                 return jsonify({"message": "Child not found"}), 404
-    except ValueError as e: # Catches validation errors from model
-        return jsonify({"message": f"Failed to update child: {e}"}), 400
-    except OperationFailure as e: # Catch database errors
-        current_app.logger.error(f"Database error updating child {child_id}: {e}")
-        return jsonify({"message": f"Database error: {e}"}), 500
-    except Exception as e: # Catch ObjectId errors etc.
-        current_app.logger.error(f"Unexpected error updating child {child_id}: {e}\n{traceback.format_exc()}")
-        return jsonify({"message": "An internal server error occurred"}), 500
+    # The calling service MUST verify permissions before calling this.
+    if update_child_details(child_id, data):
+        current_app.logger.info("Child details updated for ID: %s", child_id)
+        return jsonify({"message": "Child details updated"}), 200
+    # Check if child exists to differentiate between not found and no valid fields
+    # (on the primary: a secondary may not have a just-created child yet)
+    if get_child_by_id(child_id, projection={"_id": 1}, readonly=False):
+        current_app.logger.warning("Update failed for child %s: No valid fields or data unchanged.", child_id)
+        return jsonify({"message": "No valid fields provided for update or update failed"}), 400
+    current_app.logger.warning("Update failed for child %s: Child not found.", child_id)
+    return jsonify({"message": "Child not found"}), 404
 
 @internal_bp.route('/children/<child_id>/link-supervisor', methods=['PUT'])
 @token_required # Ensure caller service provides a valid token
-def handle_link_supervisor(child_id):
+@json_route(required=['supervisor_id'], action="link supervisor",
+            missing_message="Missing supervisor_id in request body")
+def handle_link_supervisor(child_id, data):
     """
     (Internal) Links a supervisor to a child.
     Expects the calling service (e.g., child-profile-service) to have
     verified the linking code and that the user in the token is a supervisor.
     """
-    # Calling service verifies the linking code and supervisor role.
-    data = request.get_json()
-    supervisor_id = data.get('supervisor_id') if data else None
+    # Reject malformed IDs without touching the DB
+    if not ObjectId.is_valid(child_id):
+        return jsonify({"message": "Invalid child_id format"}), 400
 
-    if not supervisor_id:
-        return jsonify({"message": "Missing supervisor_id in request body"}), 400
+    # Calling service verifies the linking code and supervisor role.
+    supervisor_id = data['supervisor_id']
+    if not ObjectId.is_valid(supervisor_id):
+        return jsonify({"message": "Invalid supervisor_id format"}), 400
 
-    try:
-        # Validate IDs before attempting link
-        ObjectId(child_id)
-        ObjectId(supervisor_id)
-        success = link_supervisor_to_child(child_id, supervisor_id)
-        if success:
-             # Note: success just means child was found. Supervisor might have already been linked.
-             current_app.logger.info(f"Supervisor link updated for child {child_id}, supervisor {supervisor_id}")
-             return jsonify({"message": "Supervisor link updated successfully"}), 200
-        else:
-             # This likely means the child_id was invalid
-             current_app.logger.warning(f"Failed to link supervisor: Child not found with ID {child_id}")
-             return jsonify({"message": "Child not found"}), 404
-    except ValueError as e: # Catches validation errors from model
-         return jsonify({"message": f"Failed to link supervisor: {e}"}), 400
-    except OperationFailure as e: # Catch database errors
-        current_app.logger.error(f"Database error linking supervisor for child {child_id}: {e}")
-        return jsonify({"message": f"Database error: {e}"}), 500
-    except Exception as e: # Catch ObjectId errors etc.
-        current_app.logger.error(f"Unexpected error linking supervisor for child {child_id}: {e}\n{traceback.format_exc()}")
-        return jsonify({"message": "An internal server error occurred"}), 500
+    if link_supervisor_to_child(child_id, supervisor_id):
+        # Note: success just means child was found. Supervisor might have already been linked.
+        current_app.logger.info("Supervisor link updated for child %s, supervisor %s", child_id, supervisor_id)
+        return jsonify({"message": "Supervisor link updated successfully"}), 200
+    # This likely means the child_id was invalid
+    current_app.logger.warning("Failed to link supervisor: Child not found with ID %s", child_id)
+    return jsonify({"message": "Child not found"}), 404
 
 
 # --- Internal Activity Routes (Called by other services) ---
 
 @internal_bp.route('/activities', methods=['POST'])
 @token_required # Ensure caller service provides a valid token
-def handle_add_activity():
+@json_route(required=['child_id', 'type', 'details'], action="add activity")
+def handle_add_activity(data):
     """
     (Internal) Adds a new activity record.
     Expects the calling service (e.g., activities-log-service) to have
     verified the user is a supervisor linked to the child.
     """
     # Calling service (activities-log) MUST verify supervisor role and link to child.
-    data = request.get_json()
-    # Basic validation
-    if not data or not data.get('child_id') or not data.get('type') or not data.get('details'):
-         return jsonify({"message": "Missing required fields: child_id, type, details"}), 400
-
     # Add who logged the activity (user ID from token)
-    data['logged_by'] = g.current_user_id
+    data['logged_by'] = g.current_user_oid
+
+    activity_id = add_activity_record(data)
+    current_app.logger.info("Activity record created with ID: %s for child %s by user %s", activity_id, data.get('child_id'), g.current_user_id)
+    # 'data' is now the stored document (insert_one sets _id), so callers get the
+    # created record without a follow-up GET
+    return jsonify({"message": "Activity added successfully", "activity_id": activity_id, "activity": data}), 201
+
+
+@internal_bp.route('/activities/batch', methods=['POST'])
+@token_required # Ensure caller service provides a valid token
+@json_route(required=['activities'], action="add activities",
+            missing_message="Missing required field: activities (non-empty list)")
+def handle_add_activities_batch(data):
+    """
+    (Internal) Adds several activity records in one request and one bulk insert.
+    Expects {"activities": [...]} where each item has the same fields as a single activity.
+    Same authorization expectations as the single-activity route.
+    """
+    activities = data['activities']
+    if not isinstance(activities, list):
+        return jsonify({"message": "Missing required field: activities (non-empty list)"}), 400
+    if len(activities) > ACTIVITIES_MAX_BATCH:
+        return jsonify({"message": f"Too many activities in one batch (max {ACTIVITIES_MAX_BATCH})"}), 400
+
+    for index, activity in enumerate(activities):
+        # Basic validation (same as the single-activity route)
+        if not isinstance(activity, dict) or not activity.get('child_id') or not activity.get('type') or not activity.get('details'):
+            return jsonify({"message": f"Missing required fields at index {index}: child_id, type, details"}), 400
+        # Add who logged the activity (user ID from token)
+        activity['logged_by'] = g.current_user_oid
 
     try:
-        activity_id = add_activity_record(data)
-        current_app.logger.info(f"Activity record created with ID: {activity_id} for child {data.get('child_id')} by user {g.current_user_id}")
-        return jsonify({"message": "Activity added successfully", "activity_id": activity_id}), 201
-    except ValueError as e: # Catches validation errors from model
-        return jsonify({"message": f"Failed to add activity: {e}"}), 400
-    except OperationFailure as e: # Catch database errors
-        current_app.logger.error(f"Database error adding activity: {e}")
-        return jsonify({"message": f"Database error: {e}"}), 500
-    except Exception as e:
-        current_app.logger.error(f"Unexpected error adding activity: {e}\n{traceback.format_exc()}")
-        return jsonify({"message": "An internal server error occurred"}), 500
+        activity_ids = add_activity_records(activities)
+    except BulkWriteError as e: # Some documents were rejected (an OperationFailure, so handled before json_route sees it)
+        errors = [{"index": err.get('index'), "message": err.get('errmsg')} for err in e.details.get('writeErrors', [])]
+        return jsonify({
+            "message": "Database error: some activities could not be added",
+            "inserted_count": e.details.get('nInserted', 0),
+            "errors": errors
+        }), 500
+    current_app.logger.info("%d activity records created in batch by user %s", len(activity_ids), g.current_user_id)
+    return jsonify({"message": "Activities added successfully", "activity_ids": activity_ids}), 201
+
+
+# --- Test Setup/Teardown Routes (dev/test only, see testing_bp) ---
+
+@testing_bp.route('/test-setup', methods=['POST'])
+@token_required
+@json_route(required=['child', 'supervisor_id', 'activity'], action="set up test data")
+def handle_test_setup(data):
+    """
+    (Dev/Test only) Creates a child for the calling parent, links a supervisor and
+    logs one activity by that supervisor, so test fixtures need a single request.
+    Expects {"child": {...}, "supervisor_id": "...", "activity": {"type": ..., "details": ...}}.
+    """
+    if g.current_user_role != 'parent':
+        return jsonify({"message": "Unauthorized: Only parents can initiate child creation"}), 403
+    supervisor_oid = parse_object_id(data['supervisor_id'])
+    if supervisor_oid is None:
+        return jsonify({"message": "Invalid supervisor_id format"}), 400
+    if not isinstance(data['child'], dict) or not isinstance(data['activity'], dict):
+        return jsonify({"message": "'child' and 'activity' must be objects"}), 400
+
+    child_id = create_child_record(data['child'], parent_id=g.current_user_oid)
+    link_supervisor_to_child(child_id, supervisor_oid)
+    activity = dict(data['activity'], child_id=child_id, logged_by=supervisor_oid)
+    activity_id = add_activity_record(activity)
+    current_app.logger.info("Test setup created child %s and activity %s", child_id, activity_id)
+    return jsonify({"child_id": child_id, "activity_id": activity_id, "activity": activity}), 201
+
+@testing_bp.route('/test-teardown', methods=['POST'])
+@token_required
+@json_route(required=['child_ids'], action="tear down test data")
+def handle_test_teardown(data):
+    """
+    (Dev/Test only) Deletes children created by the calling parent together with
+    all their activities, so test runs can clean up in a single request.
+    Expects {"child_ids": ["...", ...]}; IDs of other parents' children are ignored.
+    """
+    if g.current_user_role != 'parent':
+        return jsonify({"message": "Unauthorized: Only parents can delete their children"}), 403
+    if not isinstance(data['child_ids'], list):
+        return jsonify({"message": "'child_ids' must be a list"}), 400
+
+    children_deleted, activities_deleted = delete_children_of_parent(data['child_ids'], g.current_user_oid)
+    # Drop this worker's cached grants; other workers' expire after ACCESS_CACHE_TTL_SECONDS
+    _forget_child_access(parse_object_id(child_id) for child_id in data['child_ids'])
+    return jsonify({"children_deleted": children_deleted, "activities_deleted": activities_deleted}), 200
 
 
 # --- Data Routes (Potentially Exposed via Gateway) ---
@@ -203,21 +352,26 @@ def handle_add_activity():
 @token_required # Token needed
 def handle_get_child_data(child_id):
     """Gets details for a specific child (requires authorization check)."""
+    # Parse once; reject malformed IDs without touching the DB
+    child_oid = parse_object_id(child_id)
+    if child_oid is None:
+        return jsonify({"message": "Invalid child_id format"}), 400
+
     # Authorization check: Is the requesting user allowed to see this child?
-    if not check_child_access(child_id):
+    if not check_child_access(child_oid):
         # Logged inside check_child_access
         return jsonify({"message": "Forbidden: You do not have access to this child's data"}), 403
 
     try:
-        child = get_child_by_id(child_id)
+        child = get_child_by_id(child_oid)
         if child:
             return jsonify(child), 200
         else:
             # Log if child not found after authorization check (unlikely but possible)
-            current_app.logger.warning(f"Child {child_id} not found during GET request by authorized user {g.current_user_id}")
+            current_app.logger.warning("Child %s not found during GET request by authorized user %s", child_id, g.current_user_id)
             return jsonify({"message": "Child not found"}), 404
     except Exception as e:
-        current_app.logger.error(f"Error getting child {child_id}: {e}\n{traceback.format_exc()}")
+        current_app.logger.exception("Error getting child %s: %s", child_id, e)
         return jsonify({"message": "An internal server error occurred"}), 500
 
 @data_bp.route('/children', methods=['GET'])
@@ -230,35 +384,100 @@ def handle_get_children_list_data():
 
     try:
         if user_role == 'parent':
-            children_list = get_children_for_parent(user_id)
+            children_list = get_children_for_parent(g.current_user_oid)
         elif user_role == 'teacher':
-            children_list = get_children_for_supervisor(user_id)
+            children_list = get_children_for_supervisor(g.current_user_oid)
         # Add logic for other roles (e.g., admin) if needed
         else:
             # Handle unexpected roles if necessary
-             current_app.logger.warning(f"User {user_id} with unexpected role '{user_role}' attempted to list children.")
+             current_app.logger.warning("User %s with unexpected role '%s' attempted to list children.", user_id, user_role)
              return jsonify({"message": "Invalid user role for this operation"}), 403
 
 
-        return jsonify(children_list), 200
+        return mongo_jsonify(children_list)
+    except Exception as e:
+        current_app.logger.exception("Error getting children list for user %s: %s", user_id, e)
+        return jsonify({"message": "An internal server error occurred"}), 500
+
+@data_bp.route('/children/overview', methods=['GET'])
+@token_required # Token needed
+def handle_get_children_overview_data():
+    """Gets the current user's children together with each child's most recent activities."""
+    user_id = g.current_user_id
+    user_role = g.current_user_role
+
+    if user_role not in ('parent', 'teacher'):
+        current_app.logger.warning("User %s with unexpected role '%s' attempted to get children overview.", user_id, user_role)
+        return jsonify({"message": "Invalid user role for this operation"}), 403
+
+    try:
+        limit = int(request.args.get('limit', 5))
+    except ValueError:
+        return jsonify({"message": "Invalid limit. Must be an integer."}), 400
+    if limit < 1 or limit > 50:
+        return jsonify({"message": "Invalid limit. Must be between 1 and 50."}), 400
+
+    try:
+        children_list = get_children_with_recent_activities(g.current_user_oid, user_role, limit)
+        return mongo_jsonify(children_list)
     except Exception as e:
-        current_app.logger.error(f"Error getting children list for user {user_id}: {e}\n{traceback.format_exc()}")
+        current_app.logger.exception("Error getting children overview for user %s: %s", user_id, e)
         return jsonify({"message": "An internal server error occurred"}), 500
 
 @data_bp.route('/activities', methods=['GET'])
 @token_required # Token needed
 def handle_get_activities_data():
-    """Gets activities for a specific child, with optional filters (requires authorization)."""
+    """
+    Gets activities for a specific child, with optional filters (requires authorization).
+    Without 'limit' or 'before_id' the full history is returned, newest 'created_at' first.
+    With either, one page (default ACTIVITIES_DEFAULT_LIMIT, max ACTIVITIES_MAX_LIMIT)
+    is returned newest '_id' first; while more records remain, the response carries
+    the next-page cursor in the 'X-Next-Before-Id' header and a 'Link: rel="next"' URL.
+    'format=ndjson' streams one activity per line and is unbounded unless 'limit' is
+    given; its pages carry no headers, the last line's '_id' is the next 'before_id'.
+    """
     child_id = request.args.get('child_id')
     activity_type = request.args.get('type') # Optional filter (e.g., 'meal', 'sleep', 'drawing')
     start_date_str = request.args.get('start_date') # Optional filter YYYY-MM-DD
     end_date_str = request.args.get('end_date')     # Optional filter YYYY-MM-DD
+    before_id = request.args.get('before_id') or None # Optional pagination cursor (last _id of previous page); empty means absent
 
     if not child_id:
         return jsonify({"message": "Missing required query parameter: child_id"}), 400
+    try:
+        projection = parse_fields_param(request.args.get('fields')) # Optional field selection for list views
+    except ValueError as e:
+        return jsonify({"message": f"Invalid fields parameter. {e}"}), 400
+    # Parse once; reject malformed IDs without touching the DB
+    child_oid = parse_object_id(child_id)
+    if child_oid is None:
+        return jsonify({"message": "Invalid child_id format"}), 400
+    if before_id:
+        before_id = parse_object_id(before_id)
+        if before_id is None:
+            return jsonify({"message": "Invalid before_id format"}), 400
+
+    # Optional NDJSON streaming (one activity per line) for large histories
+    stream = request.args.get('format') == 'ndjson'
+
+    # --- Pagination ---
+    # Only requests asking for it are paged; plain requests keep the full listing
+    paged = 'limit' in request.args or before_id is not None
+    # Streaming is unbounded unless a limit is given explicitly
+    default_limit = 0 if stream or not paged else ACTIVITIES_DEFAULT_LIMIT
+    try:
+        limit = int(request.args.get('limit', default_limit))
+    except ValueError:
+        return jsonify({"message": "Invalid limit. Must be an integer."}), 400
+    if stream and limit < 0:
+        return jsonify({"message": "Invalid limit. Must not be negative."}), 400
+    if not stream and paged and (limit < 1 or limit > ACTIVITIES_MAX_LIMIT):
+        return jsonify({"message": f"Invalid limit. Must be between 1 and {ACTIVITIES_MAX_LIMIT}."}), 400
+    # Pages follow the _id keyset cursor; full listings keep the created_at order
+    sort_field = "_id" if paged else "created_at"
 
     # --- Authorization Check ---
-    if not check_child_access(child_id):
+    if not check_child_access(child_oid):
         # Logged inside check_child_access
         return jsonify({"message": "Forbidden: You do not have access to this child's activities"}), 403
 
@@ -268,25 +487,43 @@ def handle_get_activities_data():
     try:
         if start_date_str:
             # Parse date string, assume start of the day
-            start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
+            start_date = _parse_ymd(start_date_str)
         if end_date_str:
             # Parse date string and add one day to make range exclusive of the end date
             # e.g., end_date=2023-10-27 means include up to 2023-10-26 23:59:59...
-            end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d') + datetime.timedelta(days=1)
+            end_date = _parse_ymd(end_date_str) + datetime.timedelta(days=1)
     except ValueError:
         return jsonify({"message": "Invalid date format. Use YYYY-MM-DD."}), 400
 
     try:
         # Call model function with validated parameters
-        activities = get_activities_for_child(child_id, activity_type, start_date, end_date)
-        return jsonify(activities), 200
+        if stream:
+            cursor = stream_activities_for_child(child_oid, activity_type, start_date, end_date, limit=limit, before_id=before_id, projection=projection, sort_field=sort_field)
+            return mongo_ndjson_stream(cursor)
+        if not paged:
+            # Full listing: encode documents straight off the cursor instead of building a list
+            cursor = stream_activities_for_child(child_oid, activity_type, start_date, end_date, projection=projection, sort_field=sort_field)
+            return mongo_json_array_stream(cursor)
+
+        # One page: fetch a single extra record to know whether another page follows
+        cursor = stream_activities_for_child(child_oid, activity_type, start_date, end_date, limit=limit + 1, before_id=before_id, projection=projection, batch_size=limit + 1)
+        page = list(cursor)
+        has_more = len(page) > limit
+        del page[limit:]
+        response = mongo_jsonify(page)
+        if has_more:
+            next_before_id = str(page[-1]['_id'])
+            next_args = dict(request.args.to_dict(), before_id=next_before_id, limit=limit)
+            response.headers['X-Next-Before-Id'] = next_before_id
+            response.headers['Link'] = f'<{url_for(request.endpoint, **next_args)}>; rel="next"'
+        return response
     except ValueError as e: # Catches validation errors from model (e.g., invalid child_id format)
          return jsonify({"message": f"Failed to get activities: {e}"}), 400
     except OperationFailure as e: # Catch database errors
-        current_app.logger.error(f"Database error getting activities for child {child_id}: {e}")
+        current_app.logger.error("Database error getting activities for child %s: %s", child_id, e)
         return jsonify({"message": f"Database error: {e}"}), 500
     except Exception as e:
-        current_app.logger.error(f"Unexpected error getting activities for child {child_id}: {e}\n{traceback.format_exc()}")
+        current_app.logger.exception("Unexpected error getting activities for child %s: %s", child_id, e)
         return jsonify({"message": "An internal server error occurred"}), 500
 
 @data_bp.route('/activities/<activity_id>', methods=['DELETE'])
@@ -298,47 +535,36 @@ def handle_delete_activity(activity_id):
 
     # --- Authorization ---
     # 1. Basic role check: Only teachers/supervisors can delete
+    # (before any input validation, so other roles learn nothing about the ID)
     if user_role != 'teacher':
         return jsonify({"message": "Forbidden: Only supervisors can delete activities"}), 403
 
-    try:
-        # 2. Get the activity to find the associated child_id
-        # Use the specific model function for this
-        activity = get_activity_by_id(activity_id)
-        if not activity:
-            return jsonify({"message": "Activity not found"}), 404
+    # Reject malformed IDs without touching the DB
+    if not ObjectId.is_valid(activity_id):
+        return jsonify({"message": "Invalid activity_id format"}), 400
 
-        child_id = activity.get('child_id') # Should be string from _serialize_doc
-        if not child_id:
-             # This shouldn't happen if data integrity is maintained
-             current_app.logger.error(f"Activity {activity_id} is missing child_id!")
-             return jsonify({"message": "Internal data error: Activity missing child link"}), 500
-
-        # 3. Check if the supervisor (user_id from token) is linked to that child
-        if not is_supervisor_of(user_id, child_id):
-            # Log the specific authorization failure
-            current_app.logger.warning(f"Authorization failed: Supervisor {user_id} attempted to delete activity {activity_id} for child {child_id} they do not supervise.")
-            return jsonify({"message": "Forbidden: You are not authorized to modify activities for this child"}), 403
-
-        # --- Deletion ---
-        # 4. If authorized, attempt deletion using the model function
-        deleted = delete_activity_record(activity_id)
+    try:
+        # 2. Delete only if the activity belongs to a child this supervisor is linked to
+        # (one child lookup, independent of how many children the supervisor has)
+        deleted = delete_activity_if_supervised(activity_id, g.current_user_oid)
         if deleted:
-            current_app.logger.info(f"Activity {activity_id} deleted by supervisor {user_id}")
+            current_app.logger.info("Activity %s deleted by supervisor %s", activity_id, user_id)
             return jsonify({"message": "Activity deleted successfully"}), 200
-        else:
-            # This could happen if the activity was deleted between the check and the delete call,
-            # or if the activity_id format was valid but didn't match anything.
-            # The model function already logged a warning if it didn't find the doc.
-            return jsonify({"message": "Activity not found or already deleted"}), 404
+
+        # 3. Nothing deleted: tell "not found" apart from "not authorized" (failure path only)
+        activity = get_activity_by_id(activity_id, projection={"_id": 1, "child_id": 1}, readonly=False)
+        if not activity:
+            return jsonify({"message": "Activity not found"}), 404
+        current_app.logger.warning("Authorization failed: Supervisor %s attempted to delete activity %s for child %s they do not supervise.", user_id, activity_id, activity.get('child_id'))
+        return jsonify({"message": "Forbidden: You are not authorized to modify activities for this child"}), 403
 
     except ValueError as e: # Catches validation errors from model functions
         return jsonify({"message": f"Error processing delete request: {e}"}), 400
     except OperationFailure as e: # Catch database errors
-        current_app.logger.error(f"Database error deleting activity {activity_id}: {e}")
+        current_app.logger.error("Database error deleting activity %s: %s", activity_id, e)
         return jsonify({"message": f"Database error: {e}"}), 500
     except Exception as e:
-        current_app.logger.error(f"Unexpected error deleting activity {activity_id}: {e}\n{traceback.format_exc()}")
+        current_app.logger.exception("Unexpected error deleting activity %s: %s", activity_id, e)
         return jsonify({"message": "An internal server error occurred"}), 500
 
 # Add routes for Drawings similarly if needed, although they are handled
@@ -1,25 +1,139 @@
+import datetime
+import functools
+import orjson
 from bson import ObjectId
+from flask import current_app, stream_with_context
+from flask.json.provider import JSONProvider
+from werkzeug.http import http_date
+
+
+# --- Helper to reuse already-parsed ObjectIds ---
+def to_object_id(value):
+    """Returns value unchanged if it is already an ObjectId, otherwise parses it (raises InvalidId/TypeError)."""
+    if isinstance(value, ObjectId):
+        return value
+    return ObjectId(value)
+
+
+# --- Fast YYYY-MM-DD parsing for query parameters ---
+@functools.lru_cache(maxsize=1024)
+def _parse_ymd(value):
+    """
+    Parses a 'YYYY-MM-DD' string into a naive datetime at midnight, like
+    strptime(value, '%Y-%m-%d') but without its locale-aware regex machinery.
+    Results are cached (datetimes are immutable); raises ValueError if invalid.
+    """
+    digits = value[:4] + value[5:7] + value[8:]
+    if len(value) != 10 or value[4] != '-' or value[7] != '-' or not (digits.isascii() and digits.isdigit()):
+        raise ValueError(f"time data {value!r} does not match format '%Y-%m-%d'")
+    # datetime() itself rejects out-of-range months/days (e.g. 2023-02-30)
+    return datetime.datetime(int(value[:4]), int(value[5:7]), int(value[8:]))
 
 
 # --- Helper to convert ObjectIds in documents ---
 def serialize_doc(doc):
-    """Converts ObjectId fields to string for JSON serialization."""
+    """
+    Converts ObjectId fields (top-level values and items of top-level lists,
+    e.g. _id, child_id, logged_by, parent_ids, supervisor_ids) to strings for
+    JSON serialization, in a single pass over the document.
+    """
     if not doc:
         return doc
-    # Convert main _id
-    if '_id' in doc and isinstance(doc['_id'], ObjectId):
-        doc['_id'] = str(doc['_id'])
-    # Convert ObjectIds in parent_ids list
-    if 'parent_ids' in doc and isinstance(doc['parent_ids'], list):
-        doc['parent_ids'] = [str(pid) for pid in doc.get('parent_ids', []) if isinstance(pid, ObjectId)]
-    # Convert ObjectIds in supervisor_ids list
-    if 'supervisor_ids' in doc and isinstance(doc['supervisor_ids'], list):
-        doc['supervisor_ids'] = [str(sid) for sid in doc.get('supervisor_ids', []) if isinstance(sid, ObjectId)]
-    # Convert child_id if present (e.g., in activity docs)
-    if 'child_id' in doc and isinstance(doc['child_id'], ObjectId):
-        doc['child_id'] = str(doc['child_id'])
-    # Convert logged_by if present (e.g., in activity docs)
-    if 'logged_by' in doc and isinstance(doc['logged_by'], ObjectId):
-        doc['logged_by'] = str(doc['logged_by'])
-    # Add more conversions here if other fields store ObjectIds
-    return doc
\ No newline at end of file
+    for key, value in doc.items():
+        value_type = type(value)
+        if value_type is ObjectId:
+            doc[key] = str(value)
+        elif value_type is list:
+            doc[key] = [str(item) if type(item) is ObjectId else item for item in value]
+    return doc
+
+
+# --- Fast JSON responses for raw MongoDB documents ---
+def _bson_default(obj):
+    """orjson fallback for types it cannot serialize natively."""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        # Same HTTP-date format Flask's jsonify uses, so clients see no change
+        return http_date(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(data, option=0):
+    """orjson-encodes MongoDB data with the shared ObjectId/datetime handling."""
+    return orjson.dumps(data, default=_bson_default, option=orjson.OPT_PASSTHROUGH_DATETIME | option)
+
+class OrjsonProvider(JSONProvider):
+    """
+    App-wide JSON provider (app.json) backed by orjson, so every jsonify() call
+    and request.get_json() use the fast encoder/decoder. Responses are encoded
+    straight to bytes with the same ObjectId/datetime handling as mongo_jsonify.
+    """
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return _dumps(obj, orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(_dumps(obj, orjson.OPT_NON_STR_KEYS), mimetype=self.mimetype)
+
+def mongo_jsonify(data, status=200):
+    """
+    Builds a JSON response straight from MongoDB documents (or lists of them)
+    in a single C-level orjson pass; ObjectIds become strings, so no prior
+    serialize_doc walk is needed.
+    """
+    body = _dumps(data)
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+def mongo_ndjson_stream(docs, status=200):
+    """
+    Streams an iterable of MongoDB documents (e.g. a cursor) as NDJSON, one
+    document per line, without materializing the full result in memory.
+    The first document is fetched before the response is created, so query
+    errors still propagate to the caller (and become a normal error response).
+    """
+    docs = iter(docs)
+    first = next(docs, None)
+
+    def generate():
+        if first is None:
+            return
+        yield _dumps(first, orjson.OPT_APPEND_NEWLINE)
+        try:
+            for doc in docs:
+                yield _dumps(doc, orjson.OPT_APPEND_NEWLINE)
+        except Exception as e:
+            # Headers are already sent; all we can do is log and end the stream
+            current_app.logger.error("Error while streaming documents: %s", e)
+
+    return current_app.response_class(stream_with_context(generate()), status=status, mimetype="application/x-ndjson")
+
+def mongo_json_array_stream(docs, status=200):
+    """
+    Streams an iterable of MongoDB documents (e.g. a cursor) as a JSON array,
+    encoding each document as it arrives instead of building the full list first.
+    The first document is fetched before the response is created, so query
+    errors still propagate to the caller (and become a normal error response).
+    """
+    docs = iter(docs)
+    first = next(docs, None)
+
+    def generate():
+        if first is None:
+            yield b"[]"
+            return
+        yield b"[" + _dumps(first)
+        try:
+            for doc in docs:
+                yield b"," + _dumps(doc)
+        except Exception as e:
+            # Headers are already sent; leave the array unterminated so clients see a broken body
+            current_app.logger.error("Error while streaming documents: %s", e)
+            return
+        yield b"]"
+
+    return current_app.response_class(stream_with_context(generate()), status=status, mimetype="application/json")
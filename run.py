@@ -3,11 +3,13 @@
 # Import the factory function from the package directory
 from db_interact_service import create_app
 
-# Create the app instance using the factory
+# Create the app instance using the factory.
+# create_app() builds the single, process-wide MongoClient with connect=False and
+# opens no connections itself; indexes are created with 'flask ensure-indexes'.
 app = create_app()
 
-# This block is primarily for local development using 'python run.py'
-# It's typically NOT used when running via Docker with 'flask run' or gunicorn
+# This block is only for local debugging using 'python run.py'.
+# Docker runs gunicorn with threaded workers against wsgi:app instead (see Dockerfile).
 if __name__ == '__main__':
     # Use a different port than auth_service (e.g., 5001) for local testing
     # Host 0.0.0.0 makes it accessible on the network
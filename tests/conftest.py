@@ -1,7 +1,12 @@
 # tests/conftest.py
 import pytest
 import os
+import json
+import socket
+from filelock import FileLock
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 @pytest.fixture(scope="session")
 def auth_service_url():
@@ -13,10 +18,69 @@ def db_interact_url():
     """Fixture for the DB Interact Service URL."""
     return os.environ.get("DB_INTERACT_URL", "http://localhost:8082") # Adjust port if needed
 
+class LowLatencyHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled sockets send small JSON requests immediately (no Nagle delay) and stay alive."""
+    SOCKET_OPTIONS = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = self.SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+class TimeoutSession(requests.Session):
+    """Session that applies DEFAULT_TIMEOUT to every request unless a call passes its own timeout."""
+    DEFAULT_TIMEOUT = float(os.environ.get("TEST_HTTP_TIMEOUT", "5"))
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
 @pytest.fixture(scope="session")
 def http_session():
-    """Provides a requests session for making HTTP calls."""
-    # You could add default headers or other session configurations here if needed
-    with requests.Session() as session:
+    """Provides a pooled requests session (keep-alive connections, bounded timeouts) for making HTTP calls."""
+    with TimeoutSession() as session:
+        # Reuse TCP connections to both services instead of reconnecting per call.
+        # pool_maxsize covers concurrent calls from worker threads. Only transient
+        # gateway errors (502/503/504, e.g. a service restarting behind the proxy)
+        # are retried; connection errors and every other status surface immediately.
+        # urllib3's default allowed_methods covers idempotent methods only: a retried
+        # POST could create a second child/activity that no fixture tracks or tears down.
+        retries = Retry(
+            total=2,
+            connect=0,
+            read=0,
+            backoff_factor=0.05,
+            status_forcelist=[502, 503, 504],
+            raise_on_status=False, # Hand the last response to the test so its assertion shows the status
+        )
+        adapter = LowLatencyHTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
         session.headers.update({"Content-Type": "application/json"})
         yield session
+
+@pytest.fixture(scope="session")
+def run_once(tmp_path_factory, request):
+    """
+    Returns run_once(name, produce) for xdist-safe session setup: the first worker
+    to get the lock calls produce() and stores its JSON result in the shared base
+    temp dir; the other workers read it instead of repeating the HTTP setup.
+    Without xdist, produce() is simply called.
+    """
+    worker_id = getattr(request.config, "workerinput", {}).get("workerid", "master")
+
+    def _run_once(name, produce):
+        if worker_id == "master":
+            return produce()
+        # getbasetemp() is per worker; its parent is shared by all workers of this run
+        data_file = tmp_path_factory.getbasetemp().parent / f"{name}.json"
+        with FileLock(str(data_file) + ".lock"):
+            if data_file.is_file():
+                return json.loads(data_file.read_text())
+            data = produce()
+            data_file.write_text(json.dumps(data))
+            return data
+
+    return _run_once
@@ -0,0 +1,126 @@
+# tests/test_decorators.py
+import time
+import pytest
+import jwt
+from bson import ObjectId
+from flask import Flask, g, jsonify
+
+from db_interact_service import decorators
+from db_interact_service.decorators import token_required, json_route
+from pymongo.errors import OperationFailure
+
+JWT_SECRET = "unit-test-secret"
+
+# --- Fixtures ---
+
+@pytest.fixture
+def app():
+    """Minimal Flask app with one protected route (no database needed)."""
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY=JWT_SECRET, JWT_ALGORITHM="HS256")
+
+    @app.route('/protected')
+    @token_required
+    def protected():
+        return jsonify({"sub": g.token_claims["sub"], "role": g.current_user_role}), 200
+
+    @app.route('/echo', methods=['POST'])
+    @json_route(required=['name'], action="echo")
+    def echo(data):
+        if data['name'] == 'invalid':
+            raise ValueError("bad name")
+        if data['name'] == 'db-down':
+            raise OperationFailure("not primary")
+        return jsonify(data), 200
+
+    @app.route('/link', methods=['POST'])
+    @json_route(required=['supervisor_id'], missing_message="Missing supervisor_id in request body")
+    def link(data):
+        return jsonify(data), 200
+
+    # Start every test with an empty verified-token cache
+    decorators._jwt_cache.clear()
+    yield app
+    decorators._jwt_cache.clear()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_token(**overrides):
+    """Creates a signed access token for a random user. Returns (token, payload)."""
+    payload = {
+        "sub": str(ObjectId()),
+        "role": "parent",
+        "type": "access",
+        "exp": int(time.time()) + 300,
+    }
+    payload.update(overrides)
+    return jwt.encode(payload, JWT_SECRET, algorithm="HS256"), payload
+
+# --- Tests ---
+
+def test_token_decoded_once_per_request(client, mocker):
+    """The token is decoded exactly once and the claims are exposed on g."""
+    decode_spy = mocker.spy(jwt, "decode")
+    token, payload = make_token()
+
+    response = client.get('/protected', headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["sub"] == payload["sub"]
+    assert decode_spy.call_count == 1
+
+def test_cached_token_skips_decode(client, mocker):
+    """A repeated token is served from the cache without decoding again."""
+    token, _ = make_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get('/protected', headers=headers).status_code == 200
+
+    decode_spy = mocker.spy(jwt, "decode")
+    assert client.get('/protected', headers=headers).status_code == 200
+    assert decode_spy.call_count == 0
+
+def test_expired_token_rejected_without_decode(client, mocker):
+    """An expired token is rejected before signature verification."""
+    decode_spy = mocker.spy(jwt, "decode")
+    token, _ = make_token(exp=int(time.time()) - 10)
+
+    response = client.get('/protected', headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+    assert response.get_json()["message"] == "Access token has expired!"
+    assert decode_spy.call_count == 0
+
+def test_json_route_passes_parsed_body(client):
+    """The parsed JSON body reaches the route as the 'data' argument."""
+    response = client.post('/echo', json={"name": "Ana"})
+    assert response.status_code == 200
+    assert response.get_json() == {"name": "Ana"}
+
+@pytest.mark.parametrize("body", [None, {}, {"name": ""}, {"other": 1}])
+def test_json_route_rejects_missing_fields(client, body):
+    """A missing body or missing/empty required field is a 400."""
+    response = client.post('/echo', json=body) if body is not None else client.post('/echo')
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Missing required fields: name"
+
+def test_json_route_translates_errors(client):
+    """ValueError becomes a 400 and OperationFailure a 500."""
+    response = client.post('/echo', json={"name": "invalid"})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Failed to echo: bad name"
+
+    response = client.post('/echo', json={"name": "db-down"})
+    assert response.status_code == 500
+    assert response.get_json()["message"].startswith("Database error:")
+
+def test_json_route_keeps_custom_missing_message(client):
+    """A route-specific missing-field message is returned unchanged."""
+    response = client.post('/link', json={})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Missing supervisor_id in request body"
+
+def test_json_route_rejects_non_json_body_with_json_400(client):
+    """A non-JSON body gets the JSON 400, not Flask's HTML 415."""
+    response = client.post('/echo', data="name=Ana", content_type="application/x-www-form-urlencoded")
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Missing required fields: name"
@@ -0,0 +1,11 @@
+# --- db_interact_service/wsgi.py ---
+
+# WSGI entry point for production servers (gunicorn), e.g.:
+#   gunicorn --workers 4 --worker-class gthread --threads 8 --preload --bind 0.0.0.0:5000 wsgi:app
+# Each worker shares one pooled MongoClient across its threads (see models.init_db),
+# so OPERATIONAL_MONGO_MAX_POOL_SIZE should be >= the number of threads per worker.
+# create_app() opens no Mongo connections, so --preload is fork-safe; run
+# 'flask ensure-indexes' once before starting the server (the Dockerfile does).
+from db_interact_service import create_app
+
+app = create_app()